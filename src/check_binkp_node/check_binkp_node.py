@@ -1,90 +1,213 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import functools
+import logging
 import nagiosplugin
 from datetime import datetime, timezone
-from pprint import pprint
-from construct import Int8ub, Struct, this, Bytes, GreedyRange
 import time
 import socket
-import dateparser
+import struct
+from email.utils import parsedate_to_datetime
 
 __version__ = '0.1'
 
+_log = logging.getLogger('nagiosplugin')
+
 CONN_TIMEOUT = 10
 READ_TIMEOUT = 3
+RECV_SIZE = 65536
 
 # The v1.0 BINK Protocol spec:
 # https://github.com/pgul/binkd/blob/master/doc/binkp10-en.txt
 # Of course, I am not implementing an actual BINKP client...
-binkp10format = Struct(
-    "type"/Int8ub,
-    "length"/Int8ub,
-    "cmdargs"/Int8ub,
-    "string"/Bytes(this.length-1),
-)
+# Every frame is a 2-byte big-endian header (top bit set for command
+# frames, lower 15 bits are the payload length) followed by the payload.
+# Command payloads start with the command id; M_NUL (0) carries TIME.
+BINKP_HEADER = struct.Struct('>H')
+BINKP_MAX_FRAME = 2 + 0x7fff
+TIME_PREFIX = b'\x00TIME '
+
+
+def iter_frames(buf):
+    mv = memoryview(buf)
+    i = 0
+    n = len(mv)
+    while i + 2 <= n:
+        header, = BINKP_HEADER.unpack_from(mv, i)
+        t = header >> 8
+        ln = header & 0x7fff
+        end = i + 2 + ln
+        if end > n:
+            break
+        yield t, bytes(mv[i + 2:end])
+        i = end
+
+
+def parse_binkp_time(node_time):
+    # Nodes send an RFC 822 style date, e.g. "Sat, 20 Jan 2024 12:34:56 +0000"
+    try:
+        binkpdate = parsedate_to_datetime(node_time)
+    except (TypeError, ValueError):
+        return None
+    # "-0000" and zone-less dates come back naive; read them as UTC rather
+    # than letting timestamp() assume the monitoring host's local zone.
+    if binkpdate.tzinfo is None:
+        binkpdate = binkpdate.replace(tzinfo=timezone.utc)
+    return binkpdate
+
+
+def time_frame_drift(payload, start_ns):
+    node_time = payload[len(TIME_PREFIX):].decode('ascii', 'replace')
+    binkpdate = parse_binkp_time(node_time.strip())
+    if not binkpdate:
+        _log.warning('Failed to parse BinkP date: %s', node_time)
+        return None
+
+    binkp_epoch = binkpdate.timestamp()
+    local_epoch = time.time()
+    delta = local_epoch - binkp_epoch
+    req_duration = (time.monotonic_ns() - start_ns) / 1e9
+    drift = abs(delta - req_duration)
+    if _log.isEnabledFor(logging.DEBUG):
+        _log.debug('BINKP DATE: %s LOCAL DATE: %s', binkpdate,
+                   datetime.fromtimestamp(local_epoch, binkpdate.tzinfo))
+        _log.debug('delta %.6fs, request took %.6fs', delta, req_duration)
+    return drift
+
+
+class GreetingBuffer:
+    # Greeting bytes are received straight into one preallocated buffer
+    # (recv_into / BufferedProtocol) and walked as they arrive; only the
+    # tail of an incomplete frame is kept between reads. RECV_SIZE exceeds
+    # BINKP_MAX_FRAME, so there is always room left for the next read.
+    def __init__(self):
+        self.buf = bytearray(RECV_SIZE)
+        self.filled = 0
+        self.received = 0
+        self.time_payload = None
+
+    def free(self):
+        return memoryview(self.buf)[self.filled:]
+
+    def feed(self, nbytes):
+        self.filled += nbytes
+        self.received += nbytes
+        consumed = 0
+        for t, payload in iter_frames(memoryview(self.buf)[:self.filled]):
+            consumed += 2 + len(payload)
+            # Only command frames (top header bit set) can carry TIME.
+            if t & 0x80 and payload.startswith(TIME_PREFIX):
+                self.time_payload = payload
+                break
+        if self.time_payload is not None:
+            # Anything after TIME is of no interest; keep room to read it.
+            self.filled = 0
+        else:
+            tail = self.filled - consumed
+            self.buf[:tail] = self.buf[consumed:self.filled]
+            self.filled = tail
+        return self.time_payload
+
+    def drift(self, start_ns):
+        if self.time_payload is not None:
+            return time_frame_drift(self.time_payload, start_ns)
+        if not self.received:
+            _log.warning('No data received from the BinkP node.')
+        else:
+            _log.warning('No TIME message found in BinkP response.')
+        return None
+
+
+class GreetingProtocol(asyncio.BufferedProtocol):
+    def __init__(self):
+        self.greeting = GreetingBuffer()
+        self.finished = False
+        self.progress = asyncio.Event()
+
+    def get_buffer(self, sizehint):
+        return self.greeting.free()
+
+    def buffer_updated(self, nbytes):
+        if self.greeting.feed(nbytes) is not None:
+            self.finished = True
+        self.progress.set()
+
+    def connection_lost(self, exc):
+        self.finished = True
+        self.progress.set()
+
+
+def tune_socket(s):
+    # Small frames plus delayed ACK would otherwise stall us (and skew the
+    # drift) by up to ~40ms; keepalive avoids hanging on half-open peers.
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 
 
 def binkp_node_parse(host, port, connect_timeout=10, read_timeout=3):
-    start_time = datetime.now().replace(microsecond=0)
+    start_ns = time.monotonic_ns()
     s = None
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(connect_timeout)
-        s.connect((host, port))
+        s = socket.create_connection((host, port), timeout=connect_timeout)
+        tune_socket(s)
         s.settimeout(read_timeout)
-        time.sleep(1)  # Allow time for server to send data
-        
-        realdata = bytearray()
-        while True:
+
+        # Stop at TIME; the socket timeout bounds how long we wait for data.
+        greeting = GreetingBuffer()
+        while greeting.time_payload is None:
             try:
-                data = s.recv(128)
-                if not data:
-                    break
-                realdata.extend(data)
+                nbytes = s.recv_into(greeting.free())
             except socket.timeout:
                 break
-            except Exception as e:
-                print(f"Error receiving data: {e}")
-                return None
-        
-        if not realdata:
-            print("No data received from the BinkP node.")
-            return None
-
-        parser = GreedyRange(binkp10format)
-        try:
-            x = parser.parse(realdata)
-        except Exception as e:
-            print(f"Error parsing BinkP protocol: {e}")
-            return None
-
-        for item in x:
-            try:
-                d_item = item.string.decode('ascii')
-                if d_item.startswith('TIME '):
-                    node_time = d_item.split('TIME ')[1]
-                    binkpdate = dateparser.parse(node_time)
-                    if not binkpdate:
-                        print(f"Failed to parse BinkP date: {node_time}")
-                        return None
-                    
-                    today = datetime.now(binkpdate.tzinfo).replace(microsecond=0)
-                    delta = (today - binkpdate).total_seconds()
-                    req_duration = (datetime.now() - start_time).total_seconds()
-                    drift = abs(delta - req_duration)
-                    return drift
-            except Exception as e:
-                print(f"Error processing item: {e}")
-                continue
-        print("No TIME message found in BinkP response.")
-        return None
+            if not nbytes:
+                break
+            greeting.feed(nbytes)
+        return greeting.drift(start_ns)
     except (socket.error, socket.timeout) as e:
-        print(f"Connection error: {e}")
+        _log.warning('Connection error: %s', e)
         return None
     finally:
         if s:
             s.close()
 
+
+async def binkp_node_parse_async(host, port, connect_timeout=10, read_timeout=3):
+    start_ns = time.monotonic_ns()
+    transport = None
+    try:
+        transport, protocol = await asyncio.wait_for(
+            asyncio.get_running_loop().create_connection(
+                GreetingProtocol, host, port, happy_eyeballs_delay=0.25),
+            connect_timeout)
+        tune_socket(transport.get_extra_info('socket'))
+
+        # Hang up as soon as the TIME frame is complete, or once the node
+        # has been quiet for read_timeout.
+        while not protocol.finished:
+            protocol.progress.clear()
+            try:
+                await asyncio.wait_for(protocol.progress.wait(), read_timeout)
+            except asyncio.TimeoutError:
+                break
+        return protocol.greeting.drift(start_ns)
+    except (OSError, asyncio.TimeoutError) as e:
+        _log.warning('Connection error: %s', e)
+        return None
+    finally:
+        if transport:
+            transport.close()
+
+
+def probe_many(hosts, port=24554, connect_timeout=10, read_timeout=3):
+    """Probe several nodes concurrently, returning their drifts in order."""
+    async def gather():
+        return await asyncio.gather(*[
+            binkp_node_parse_async(host, port, connect_timeout, read_timeout)
+            for host in hosts])
+    return asyncio.run(gather())
+
+
 class BinkpNodeCheck(nagiosplugin.Resource):
     def __init__(self, host, port, conn_timeout, read_timeout):
         self.host = host
@@ -93,7 +216,7 @@ class BinkpNodeCheck(nagiosplugin.Resource):
         self.read_timeout = read_timeout
 
     def probe(self):
-        time_diff = binkp_node_parse(self.host, port=self.port, connect_timeout=self.conn_timeout, read_timeout=self.read_timeout)
+        time_diff = asyncio.run(binkp_node_parse_async(self.host, port=self.port, connect_timeout=self.conn_timeout, read_timeout=self.read_timeout))
         if time_diff is None:
             return [nagiosplugin.Metric('binkpnodedrift', -1, context='default')]
         return [nagiosplugin.Metric('binkpnodedrift', time_diff, context='default')]
@@ -106,8 +229,8 @@ class LoadSummary(nagiosplugin.Summary):
     pass
 
 
-@nagiosplugin.guarded
-def main():
+@functools.lru_cache(maxsize=1)
+def _get_parser():
     argp = argparse.ArgumentParser(description=__doc__)
     argp.add_argument('-w', '--warning', metavar='RANGE', default='6:10',
                       help='warning SECONDS drift. Default=6:10')
@@ -118,7 +241,12 @@ def main():
     argp.add_argument('-p', '--port', metavar='PORT', default=24554, type=int,
                       help='Remote PORT for binkp service. Default is 24554.')
     argp.add_argument('domain')
-    args = argp.parse_args()
+    return argp
+
+
+@nagiosplugin.guarded
+def main():
+    args = _get_parser().parse_args()
 
     wrange = args.warning
     crange = args.critical
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import timedelta, timezone
+from email.utils import formatdate
+
+from check_binkp_node.check_binkp_node import (
+    GreetingBuffer, binkp_node_parse_async, iter_frames, parse_binkp_time)
+
+
+def command(payload):
+    return bytes([0x80 | (len(payload) >> 8), len(payload) & 0xff]) + payload
+
+
+def data(payload):
+    return bytes([len(payload) >> 8, len(payload) & 0xff]) + payload
+
+
+TIME_FRAME = command(b'\x00TIME Sat, 20 Jan 2024 12:34:56 +0000')
+GREETING = command(b'\x00SYS Test') + data(b'file') + TIME_FRAME
+
+
+def feed(greeting, chunk):
+    greeting.free()[:len(chunk)] = chunk
+    return greeting.feed(len(chunk))
+
+
+def test_iter_frames():
+    assert list(iter_frames(GREETING)) == [
+        (0x80, b'\x00SYS Test'),
+        (0x00, b'file'),
+        (0x80, TIME_FRAME[2:]),
+    ]
+
+
+def test_iter_frames_long_length():
+    payload = b'x' * 300
+    assert list(iter_frames(data(payload))) == [(0x01, payload)]
+
+
+def test_iter_frames_stops_at_incomplete_frame():
+    # Split inside the header, then inside the payload.
+    assert list(iter_frames(GREETING[:1])) == []
+    assert list(iter_frames(TIME_FRAME[:-1])) == []
+
+
+def test_iter_frames_zero_length_frame():
+    assert list(iter_frames(command(b'') + TIME_FRAME)) == [
+        (0x80, b''),
+        (0x80, TIME_FRAME[2:]),
+    ]
+
+
+def test_greeting_split_across_reads():
+    # Every cut point, so both split headers and split payloads are hit.
+    for cut in range(1, len(GREETING)):
+        greeting = GreetingBuffer()
+        assert feed(greeting, GREETING[:cut]) is None
+        assert feed(greeting, GREETING[cut:]) == TIME_FRAME[2:]
+
+
+def test_greeting_byte_by_byte():
+    greeting = GreetingBuffer()
+    for i in range(len(GREETING)):
+        feed(greeting, GREETING[i:i + 1])
+    assert greeting.time_payload == TIME_FRAME[2:]
+
+
+def test_greeting_ignores_time_in_data_frame():
+    greeting = GreetingBuffer()
+    assert feed(greeting, data(TIME_FRAME[2:])) is None
+    assert greeting.received == len(TIME_FRAME)
+    assert greeting.drift(0) is None
+
+
+def test_parse_binkp_time_zone():
+    date = parse_binkp_time('Sat, 20 Jan 2024 12:34:56 +0100')
+    assert date.utcoffset() == timedelta(hours=1)
+
+
+def test_parse_binkp_time_zoneless_is_utc():
+    for node_time in ('Sat, 20 Jan 2024 12:34:56 -0000',
+                      'Sat, 20 Jan 2024 12:34:56'):
+        assert parse_binkp_time(node_time).tzinfo == timezone.utc
+
+
+def test_parse_binkp_time_garbage():
+    assert parse_binkp_time('not a date') is None
+
+
+def test_async_probe_split_greeting():
+    async def serve(reader, writer):
+        time_frame = command(b'\x00TIME ' + formatdate().encode())
+        for chunk in (command(b'\x00SYS Test')[:3], command(b'\x00SYS Test')[3:],
+                      time_frame[:1], time_frame[1:10], time_frame[10:]):
+            writer.write(chunk)
+            await writer.drain()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(1)
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await binkp_node_parse_async('127.0.0.1', port,
+                                                read_timeout=0.5)
+
+    # formatdate() has whole-second resolution.
+    assert 0 <= asyncio.run(run()) < 1.5